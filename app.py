@@ -1,5 +1,6 @@
 import os
 import streamlit as st
+import streamlit.components.v1 as components
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from langchain_core.prompts import PromptTemplate
@@ -11,7 +12,14 @@ import tempfile
 import hashlib
 import html
 import re
+import json
+import logging
+import threading
+import time
 from dotenv import load_dotenv
+from faq_store import FaqStore
+from retrieval_cache import RetrievalCache, CachedRetriever
+from conversation import ConversationMemory
 
 # Load environment variables
 load_dotenv()
@@ -26,6 +34,24 @@ INDEX_NAME = "ustax"  # Updated Pinecone index name
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 
+# Precomputed answers for canonical questions, refreshed in the background
+FAQ_PATH = os.getenv("USTAX_FAQ_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faqs.json"))
+FAQ_ANSWERS_PATH = os.getenv("USTAX_FAQ_ANSWERS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "faq_answers.json"))
+FAQ_REFRESH_SECONDS = int(os.getenv("USTAX_FAQ_REFRESH_SECONDS", "600"))
+
+# Process-wide cache of retriever results, dropped whenever the index or ingestion manifest changes
+RETRIEVAL_SEARCH_KWARGS = {"k": 6}
+RETRIEVAL_CACHE_QUERIES = int(os.getenv("USTAX_RETRIEVAL_CACHE_QUERIES", "1024"))
+RETRIEVAL_CACHE_MB = float(os.getenv("USTAX_RETRIEVAL_CACHE_MB", "32"))
+INDEX_VERSION_TTL_SECONDS = int(os.getenv("USTAX_INDEX_VERSION_TTL_SECONDS", "300"))
+# Optional conversation mode: a rolling summary lets follow-up questions be rewritten as standalone queries
+CONVERSATION_MODEL = os.getenv("USTAX_CONVERSATION_MODEL", "gpt-4o-mini")
+CONVERSATION_MAX_TOKENS = 300
+
+INGEST_MANIFEST_PATH = os.getenv("USTAX_INGEST_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_manifest.json"))
+
+logger = logging.getLogger(__name__)
+
 # Deep Navy Blue Color Palette - Sophisticated & Professional
 PRIMARY_COLOR = "#00072D"      # Deep navy blue
 SECONDARY_COLOR = "#001952"    # Lighter navy
@@ -36,11 +62,28 @@ TEXT_COLOR = "#00072D"        # Deep navy text
 BORDER_COLOR = "#d4e1f0"      # Light blue border
 HIGHLIGHT_COLOR = "#b8d4ee"   # Subtle blue highlight
 
+# Fonts are never fetched from Google unless asked for; USTAX_FONT_URL points at a self-hosted Inter woff2
+THEME_FONT_URL = os.getenv("USTAX_FONT_URL")
+THEME_GOOGLE_FONTS = os.getenv("USTAX_GOOGLE_FONTS", "").lower() in ("1", "true", "yes")
+
+def get_font_styles():
+    if THEME_FONT_URL:
+        return f"""
+    @font-face {{
+        font-family: 'Inter';
+        src: url('{THEME_FONT_URL}') format('woff2');
+        font-weight: 100 900;
+        font-display: swap;
+    }}
+"""
+    if THEME_GOOGLE_FONTS:
+        return """
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&display=swap');
+"""
+    return ""
+
 def get_theme_styles():
     return f"""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&display=swap');
-    
     .stApp {{
         background: linear-gradient(135deg, #f0f4f8 0%, #e3ecf5 25%, #d4e1f0 50%, #e3ecf5 75%, #f0f4f8 100%);
         font-family: 'Inter', sans-serif;
@@ -400,13 +443,69 @@ def get_theme_styles():
         fill: {PRIMARY_COLOR} !important;
         stroke: {PRIMARY_COLOR} !important;
     }}
+"""
 
+def get_recorder_button_styles():
+    return f"""
+.st-emotion-cache-1maeoc0 {{
+    background: linear-gradient(135deg, {PRIMARY_COLOR} 0%, {SECONDARY_COLOR} 100%) !important;
+    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15) !important;
+}}
+
+.st-emotion-cache-1maeoc0 svg {{
+    color: #ffffff !important;
+}}
 
-</style>
+.st-emotion-cache-1maeoc0:hover {{
+    background: linear-gradient(135deg, {SECONDARY_COLOR} 0%, {PRIMARY_COLOR} 100%) !important;
+    box-shadow: 0 6px 20px rgba(0, 0, 0, 0.2) !important;
+}}
 """
 
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+@st.cache_resource
+def get_compiled_theme():
+    """
+    Build the stylesheet once per process: minified, with a content hash to identify it
+    """
+    css = minify_css(get_font_styles() + get_theme_styles() + get_recorder_button_styles())
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+    return css, digest
+
+def apply_theme():
+    """
+    Inject the stylesheet into the page head once per session instead of re-sending it on every rerun
+    """
+    css, digest = get_compiled_theme()
+    if st.session_state.get("theme_digest") == digest:
+        return
+
+    # The style element lives in the parent document, so it survives after this iframe is dropped on rerun
+    css_literal = json.dumps(css).replace("</", "<\\/")
+    components.html(f"""
+    <script>
+        (function() {{
+            const doc = window.parent.document;
+            const id = "ustax-theme-{digest}";
+            if (doc.getElementById(id)) return;
+            doc.querySelectorAll('style[id^="ustax-theme-"]').forEach((el) => el.remove());
+            const style = doc.createElement("style");
+            style.id = id;
+            style.textContent = {css_literal};
+            doc.head.appendChild(style);
+        }})();
+    </script>
+    """, height=0)
+    st.session_state.theme_digest = digest
+
 # Apply theme styles
-st.markdown(get_theme_styles(), unsafe_allow_html=True)
+apply_theme()
 
 # ------------------ TEXT FORMATTING FUNCTION ------------------
 def format_text_content(text):
@@ -439,8 +538,13 @@ def extract_clean_sources(source_documents):
     sources = []
     for doc in source_documents:
         try:
-            # Extract metadata
-            metadata = doc.metadata if hasattr(doc, 'metadata') else {}
+            # Extract metadata (documents, or plain metadata dicts from cached answers)
+            if hasattr(doc, 'metadata'):
+                metadata = doc.metadata
+            elif isinstance(doc, dict):
+                metadata = doc
+            else:
+                metadata = {}
             
             # Get document name/source
             doc_name = metadata.get('source', metadata.get('title', 'Unknown Document'))
@@ -467,29 +571,73 @@ def extract_clean_sources(source_documents):
     
     return "\n".join(f"• {source}" for source in sources[:5])  # Limit to 5 sources
 
+def compact_source_metadata(source_documents):
+    """
+    Keep only the metadata needed to display sources, as literal-safe dicts
+    """
+    compact = []
+    for doc in source_documents or []:
+        metadata = doc.metadata if hasattr(doc, 'metadata') else {}
+        entry = {key: metadata[key] for key in ('source', 'title', 'page', 'page_number') if key in metadata}
+        if entry and entry not in compact:
+            compact.append(entry)
+    return compact
+
 # ------------------ PINECONE DB LOADER ------------------
+def connect_vector_store():
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+
+    # Ensure index exists
+    indexes = [idx["name"] for idx in pc.list_indexes()]
+    if INDEX_NAME not in indexes:
+        return None
+
+    embeddings = OpenAIEmbeddings(
+        model="text-embedding-3-large",
+        openai_api_key=OPENAI_API_KEY
+    )
+
+    return PineconeVectorStore(index_name=INDEX_NAME, embedding=embeddings)
+
 @st.cache_resource
 def load_vector_store():
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-
-        # Ensure index exists
-        indexes = [idx["name"] for idx in pc.list_indexes()]
-        if INDEX_NAME not in indexes:
+        db = connect_vector_store()
+        if db is None:
             st.error(f"❌ Pinecone index '{INDEX_NAME}' not found. Please create it with 3072 dimensions.")
-            return None
-
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-            openai_api_key=OPENAI_API_KEY
-        )
-
-        db = PineconeVectorStore(index_name=INDEX_NAME, embedding=embeddings)
         return db
     except Exception as e:
         st.error(f"Failed to connect to Pinecone: {str(e)}")
         return None
 
+def get_manifest_version():
+    """
+    Cheap fingerprint of the ingestion manifest, if one is present
+    """
+    try:
+        stat = os.stat(INGEST_MANIFEST_PATH)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def get_index_version():
+    """
+    Identify the current contents of the Pinecone index so cached answers can be invalidated
+    """
+    override = os.getenv("USTAX_INDEX_VERSION")
+    if override:
+        fingerprint = {"override": override}
+    else:
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        stats = pc.Index(INDEX_NAME).describe_index_stats().to_dict()
+        fingerprint = {
+            "dimension": stats.get("dimension"),
+            "total_vector_count": stats.get("total_vector_count"),
+            "namespaces": stats.get("namespaces", {}),
+        }
+    fingerprint["manifest"] = get_manifest_version()
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
 # ------------------ VOICE TRANSCRIPTION ------------------
 def transcribe_audio(uploaded_file):
     try:
@@ -543,19 +691,143 @@ def get_prompt(template):
     return PromptTemplate(template=template, input_variables=["context", "question"])
 
 # ------------------ OPENAI MODEL ------------------
+def create_openai_model():
+    return ChatOpenAI(
+        model_name="gpt-4",
+        temperature=0.3,
+        max_tokens=1024,
+        openai_api_key=OPENAI_API_KEY
+    )
+
 @st.cache_resource
 def get_openai_model():
+    try:
+        return create_openai_model()
+    except Exception as e:
+        st.error(f"Failed to init GPT-4: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_conversation_model():
     try:
         return ChatOpenAI(
-            model_name="gpt-4",
-            temperature=0.3,
-            max_tokens=1024,
+            model_name=CONVERSATION_MODEL,
+            temperature=0,
+            max_tokens=CONVERSATION_MAX_TOKENS,
             openai_api_key=OPENAI_API_KEY
         )
     except Exception as e:
-        st.error(f"Failed to init GPT-4: {str(e)}")
+        st.error(f"Failed to init conversation model: {str(e)}")
         return None
 
+def build_retrieval_qa(db, llm, retrieval_cache=None):
+    retriever = db.as_retriever(search_kwargs=RETRIEVAL_SEARCH_KWARGS)
+    if retrieval_cache is not None:
+        retriever = CachedRetriever(
+            retriever=retriever,
+            cache=retrieval_cache,
+            search_key=json.dumps(RETRIEVAL_SEARCH_KWARGS, sort_keys=True)
+        )
+
+    return RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever,
+        return_source_documents=True,
+        chain_type_kwargs={"prompt": get_prompt(PROMPT_TEMPLATE)}
+    )
+
+def clean_result(result):
+    result = result.strip()
+    if result.startswith("Response:"):
+        result = result[9:].strip()
+    return result
+
+# ------------------ FAQ STORE ------------------
+@st.cache_resource
+def get_faq_store():
+    return FaqStore(FAQ_PATH, FAQ_ANSWERS_PATH)
+
+def refresh_faq_answers(store, db, llm):
+    """
+    Regenerate answers for every FAQ that is missing or was built against an older index
+    """
+    index_version = get_index_version()
+    stale = store.stale_questions(index_version)
+    if not stale:
+        return
+
+    retrieval_qa = build_retrieval_qa(db, llm)
+    for question in stale:
+        try:
+            response = retrieval_qa.invoke({"query": question})
+        except Exception as e:
+            logger.warning("Failed to refresh FAQ %r: %s", question, e)
+            continue
+        store.update(
+            question,
+            clean_result(response["result"]),
+            compact_source_metadata(response["source_documents"]),
+            index_version
+        )
+    store.save()
+
+@st.cache_resource
+def start_faq_warmer(_store):
+    """
+    Start a single per-process background thread that keeps FAQ answers current.
+
+    The thread connects on its own and only logs failures, so page loads never wait
+    on Pinecone or show connection errors before the user asks anything.
+    """
+    def run():
+        db, llm = None, None
+        while True:
+            try:
+                if db is None:
+                    db = connect_vector_store()
+                if llm is None:
+                    llm = create_openai_model()
+                if db is not None:
+                    refresh_faq_answers(_store, db, llm)
+            except Exception as e:
+                logger.warning("FAQ refresh failed: %s", e)
+            time.sleep(FAQ_REFRESH_SECONDS)
+
+    thread = threading.Thread(target=run, name="faq-warmer", daemon=True)
+    thread.start()
+    return thread
+
+# ------------------ RETRIEVAL CACHE ------------------
+@st.cache_resource
+def get_retrieval_cache():
+    return RetrievalCache(
+        RETRIEVAL_CACHE_QUERIES,
+        int(RETRIEVAL_CACHE_MB * 1024 * 1024),
+        get_index_version,
+        get_manifest_version,
+        INDEX_VERSION_TTL_SECONDS
+    )
+
+# ------------------ CONVERSATION MEMORY ------------------
+def get_conversation_memory():
+    if 'conversation' not in st.session_state:
+        reset_conversation()
+    return st.session_state.conversation
+
+def reset_conversation():
+    # Turns made while the mode was off were never recorded, so start over whenever it is toggled
+    st.session_state.conversation = ConversationMemory()
+
+def contextualize_query(query):
+    memory = get_conversation_memory()
+    if not memory.has_history():
+        return query
+    return memory.contextualize(query, get_conversation_model())
+
+def remember_turn(query, answer):
+    get_conversation_memory().remember(query, answer)
+
 # ------------------ DISPLAY CHAT ------------------
 def display_chat_message(role, content):
     if role == "user":
@@ -613,6 +885,21 @@ def display_chat_message(role, content):
 
 # ------------------ QUERY PROCESSING ------------------
 def process_query(query, is_voice=False):
+    conversation_mode = st.session_state.get("conversation_mode", False)
+    if conversation_mode:
+        query = contextualize_query(query)
+
+    faq = get_faq_store().match(query)
+    if faq is not None:
+        result = faq["answer"]
+        if conversation_mode:
+            remember_turn(query, result)
+        if is_voice:
+            result = f"🎤 *Processed from voice input* \n\n{result}"
+        full_response = result + "\n\nSource Docs:\n" + str(faq.get("sources", []))
+        st.session_state.messages.append({'role': 'assistant', 'content': full_response})
+        st.rerun()
+
     st.markdown(f"""
     <div style="text-align: center; padding: 2rem; background: {LIGHT_BG}; border-radius: 12px; border: 2px solid {BORDER_COLOR}; box-shadow: 0 4px 12px {PRIMARY_COLOR}08;">
         <span style="color: {PRIMARY_COLOR}; font-weight: 600;">🏛️ Analyzing IRS regulations...</span>
@@ -625,28 +912,19 @@ def process_query(query, is_voice=False):
             st.error("❌ Pinecone DB unavailable.")
             return
 
-        retriever = db.as_retriever(search_kwargs={"k": 6})
         llm = get_openai_model()
         if llm is None:
             st.error("❌ GPT-4 unavailable.")
             return
 
-        prompt = get_prompt(PROMPT_TEMPLATE)
-
-        retrieval_qa = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": prompt}
-        )
+        retrieval_qa = build_retrieval_qa(db, llm, get_retrieval_cache())
 
         response = retrieval_qa.invoke({"query": query})
-        result = response["result"].strip()
+        result = clean_result(response["result"])
         source_documents = response["source_documents"]
 
-        if result.startswith("Response:"):
-            result = result[9:].strip()
+        if conversation_mode:
+            remember_turn(query, result)
         if is_voice:
             result = f"🎤 *Processed from voice input* \n\n{result}"
 
@@ -678,6 +956,9 @@ if __name__ == "__main__":
     if 'messages' not in st.session_state:
         st.session_state.messages = []
 
+    # Keep precomputed FAQ answers warm for the current index
+    start_faq_warmer(get_faq_store())
+
     if not st.session_state.messages:
         st.markdown(f"""
         <div class="assistant-message">
@@ -694,6 +975,13 @@ if __name__ == "__main__":
 
     st.markdown("###    Ask Your Questions Related To Tax")
 
+    st.toggle(
+        "💬 Conversation mode",
+        key="conversation_mode",
+        on_change=reset_conversation,
+        help="Use a short summary of earlier questions to understand follow-ups like \"what if I file separately?\""
+    )
+
     # Voice input section
     voice_col1, voice_col2, voice_col3 = st.columns([1, 2, 1])
     with voice_col2:
@@ -741,23 +1029,3 @@ if __name__ == "__main__":
     if submit and user_query.strip():
         st.session_state.messages.append({'role': 'user', 'content': user_query})
         process_query(user_query)
-
-st.markdown(f"""
-<style>
-.st-emotion-cache-1maeoc0 {{
-    background: linear-gradient(135deg, {PRIMARY_COLOR} 0%, {SECONDARY_COLOR} 100%) !important;
-    box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15) !important;
-}}
-
-.st-emotion-cache-1maeoc0 svg {{
-    color: #ffffff !important;
-}}
-
-.st-emotion-cache-1maeoc0:hover {{
-    background: linear-gradient(135deg, {SECONDARY_COLOR} 0%, {PRIMARY_COLOR} 100%) !important;
-    box-shadow: 0 6px 20px rgba(0, 0, 0, 0.2) !important;
-}}
-</style>
-
-""", unsafe_allow_html=True)
-
@@ -0,0 +1,72 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Answers are cut to an excerpt and only the latest few unsummarized turns are kept, to bound the prompt
+CONVERSATION_EXCERPT_CHARS = 600
+CONVERSATION_PENDING_TURNS = 3
+
+CONVERSATION_PROMPT_TEMPLATE = """
+You keep a compact running summary of a US tax consultation and rewrite follow-up questions so they can be searched on their own.
+
+Current summary:
+{summary}
+
+Latest exchanges:
+{exchanges}
+
+New question:
+{question}
+
+Reply with exactly two lines:
+SUMMARY: <updated summary of the taxpayer's situation and the topics discussed, at most 80 words>
+QUESTION: <the new question rewritten as a standalone question, or unchanged if it already stands alone>
+"""
+
+class ConversationMemory:
+    """
+    Rolling summary of a conversation plus the turns not yet folded into it
+    """
+
+    def __init__(self):
+        self.summary = ""
+        self.pending = []
+
+    def has_history(self):
+        return bool(self.summary or self.pending)
+
+    def contextualize(self, query, llm):
+        """
+        Fold the pending turns into the summary and rewrite the query as a standalone question
+        """
+        if not self.has_history() or llm is None:
+            return query
+
+        prompt = CONVERSATION_PROMPT_TEMPLATE.format(
+            summary=self.summary or "(none yet)",
+            exchanges="\n".join(
+                f"Taxpayer: {question}\nUSTax AI: {answer}" for question, answer in self.pending
+            ) or "(none)",
+            question=query
+        )
+        try:
+            reply = llm.invoke(prompt).content
+        except Exception as e:
+            logger.warning("Could not rewrite follow-up question: %s", e)
+            return query
+
+        summary_match = re.search(r"^SUMMARY:\s*(.+)$", reply, re.MULTILINE)
+        question_match = re.search(r"^QUESTION:\s*(.+)$", reply, re.MULTILINE)
+        if summary_match:
+            # The pending turns now live in the summary, so they are never sent again
+            self.summary = summary_match.group(1).strip()
+            self.pending = []
+        return question_match.group(1).strip() if question_match else query
+
+    def remember(self, query, answer):
+        """
+        Queue a turn until the next reply folds it into the summary
+        """
+        self.pending.append((query, answer[:CONVERSATION_EXCERPT_CHARS]))
+        del self.pending[:-CONVERSATION_PENDING_TURNS]
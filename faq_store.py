@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Words that never change what a question asks. Negations, modals and every
+# topic word are deliberately absent: they must match exactly.
+FAQ_STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your",
+    "is", "are", "am", "be", "do", "does", "what", "which", "how",
+    "to", "of", "for", "on", "in", "at", "about", "please",
+}
+
+CONTRACTIONS = {
+    "can't": "can not",
+    "won't": "will not",
+    "shan't": "shall not",
+}
+
+def normalize_question(text):
+    text = text.lower().replace("’", "'")
+    for contraction, expanded in CONTRACTIONS.items():
+        text = text.replace(contraction, expanded)
+    text = re.sub(r"n't\b", " not", text)
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return " ".join(text.split())
+
+def question_terms(text):
+    """
+    Content words of a question, with simple plurals folded so "deductions" matches "deduction"
+    """
+    terms = []
+    for word in normalize_question(text).split():
+        if word in FAQ_STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return tuple(sorted(terms))
+
+class FaqStore:
+    """
+    Canonical questions from a read-only FAQ file, with generated answers kept in a separate cache file
+    """
+
+    def __init__(self, path, answers_path):
+        self.path = path
+        self.answers_path = answers_path
+        self.lock = threading.Lock()
+        self.index_version = None
+        self.entries = self._load_questions()
+        self.answers = self._load_answers()
+
+    def _load_questions(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f).get("faqs", [])
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load FAQ file %s: %s", self.path, e)
+            return []
+
+        for entry in entries:
+            variants = [entry["question"]] + entry.get("aliases", [])
+            entry["_variants"] = {normalize_question(variant) for variant in variants}
+            entry["_terms"] = {question_terms(variant) for variant in variants}
+        return entries
+
+    def _load_answers(self):
+        try:
+            with open(self.answers_path, encoding="utf-8") as f:
+                return json.load(f).get("answers", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load FAQ answers %s: %s", self.answers_path, e)
+            return {}
+
+    def save(self):
+        """
+        Merge our answers into the cache file, keeping whichever copy of each answer is newer
+        """
+        with self.lock:
+            answers = dict(self.answers)
+
+        # Other processes may have refreshed answers since we loaded
+        for question, answer in self._load_answers().items():
+            current = answers.get(question)
+            if current is None or answer.get("updated_at", "") > current.get("updated_at", ""):
+                answers[question] = answer
+
+        try:
+            directory = os.path.dirname(self.answers_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8") as f:
+                json.dump({"answers": answers}, f, indent=2)
+                temp_path = f.name
+            os.replace(temp_path, self.answers_path)
+        except OSError as e:
+            # Read-only deploys still serve the answers held in memory
+            logger.warning("Could not save FAQ answers to %s: %s", self.answers_path, e)
+
+    def match(self, query):
+        """
+        Return the answer for the FAQ the query asks, or None unless it asks exactly that question
+        """
+        normalized = normalize_question(query)
+        terms = question_terms(query)
+
+        with self.lock:
+            for entry in self.entries:
+                if normalized not in entry["_variants"] and terms not in entry["_terms"]:
+                    continue
+                answer = self.answers.get(entry["question"])
+                if not answer or not answer.get("answer"):
+                    return None
+                # Once the index version is known, only serve answers generated against it
+                if self.index_version is not None and answer.get("index_version") != self.index_version:
+                    return None
+                return answer
+        return None
+
+    def stale_questions(self, index_version):
+        with self.lock:
+            self.index_version = index_version
+            return [
+                entry["question"] for entry in self.entries
+                if self.answers.get(entry["question"], {}).get("index_version") != index_version
+                or not self.answers[entry["question"]].get("answer")
+            ]
+
+    def update(self, question, answer, sources, index_version):
+        with self.lock:
+            self.answers[question] = {
+                "answer": answer,
+                "sources": sources,
+                "index_version": index_version,
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            }
@@ -0,0 +1,601 @@
+"""
+Load generator for the USTax Streamlit app.
+
+Starts the real app.py under `streamlit run` in a separate process and drives
+many simulated browser sessions against it over Streamlit's websocket protocol,
+mixing typed questions with recorded clips uploaded through the audio widget.
+Inside the server, Pinecone, OpenAI and speech recognition are replaced with
+stand-ins whose latency can be configured, so the numbers reflect how much one
+app process can handle rather than how fast the external services are.
+
+Example:
+    python load_test.py --levels 1,2,4,8,16 --turns 5 --llm-latency 1.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import uuid
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+FAQ_PATH = os.path.join(os.path.dirname(APP_PATH), "faqs.json")
+FAKE_AUDIO_HEADER = b"USTAX-LOAD-TEST-AUDIO:"
+
+# Questions answered by the full retrieval + LLM pipeline; none of them is in faqs.json
+PIPELINE_QUESTIONS = [
+    "Is my home office deductible if I am a W-2 employee?",
+    "How are capital gains on a rental property taxed?",
+    "When are quarterly estimated taxes due?",
+    "Can I contribute to a Roth IRA with a high income?",
+    "How is unemployment compensation taxed?",
+    "Can I deduct medical expenses paid for a parent?",
+    "What records should I keep for charitable donations?",
+]
+
+def load_faq_questions():
+    with open(FAQ_PATH, encoding="utf-8") as f:
+        return [entry["question"] for entry in json.load(f).get("faqs", [])]
+
+# ------------------ BACKEND FAKES ------------------
+class Latency:
+    pinecone = 0.05
+    retrieval = 0.2
+    llm = 1.0
+    speech = 0.5
+
+def install_fakes():
+    """
+    Register stand-ins for the external services before app.py imports them
+    """
+    from langchain_core.callbacks import CallbackManagerForRetrieverRun
+    from langchain_core.documents import Document
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.retrievers import BaseRetriever
+
+    class FakeChatModel(BaseChatModel):
+        latency: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return "fake-openai"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self.latency)
+            answer = "Response: This is a simulated answer for load testing. " * 20
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    class FakeRetriever(BaseRetriever):
+        k: int = 6
+        latency: float = 0.0
+
+        def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+            time.sleep(self.latency)
+            return [
+                Document(
+                    page_content=f"Simulated IRS guidance chunk {i} for: {query} " * 40,
+                    metadata={"source": f"irs/p{17 + i}.pdf", "page": float(i + 1)}
+                )
+                for i in range(self.k)
+            ]
+
+    class FakeVectorStore:
+        def __init__(self, index_name=None, embedding=None):
+            self.index_name = index_name
+            self.embedding = embedding
+
+        def as_retriever(self, search_kwargs=None):
+            k = (search_kwargs or {}).get("k", 6)
+            return FakeRetriever(k=k, latency=Latency.retrieval)
+
+    class FakeEmbeddings:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    class FakeIndexStats:
+        def to_dict(self):
+            return {"dimension": 3072, "total_vector_count": 1000, "namespaces": {"": {"vector_count": 1000}}}
+
+    class FakeIndex:
+        def __init__(self, name):
+            self.name = name
+
+        def describe_index_stats(self):
+            time.sleep(Latency.pinecone)
+            return FakeIndexStats()
+
+    class FakePinecone:
+        def __init__(self, api_key=None):
+            self.api_key = api_key
+
+        def list_indexes(self):
+            time.sleep(Latency.pinecone)
+            return [{"name": "ustax"}]
+
+        def Index(self, name):
+            return FakeIndex(name)
+
+    class RequestError(Exception):
+        pass
+
+    class UnknownValueError(Exception):
+        pass
+
+    class AudioFile:
+        def __init__(self, path):
+            self.path = path
+
+        def __enter__(self):
+            with open(self.path, "rb") as f:
+                self.data = f.read()
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class Recognizer:
+        def record(self, source):
+            return source.data
+
+        def recognize_google(self, audio_data):
+            time.sleep(Latency.speech)
+            if not audio_data.startswith(FAKE_AUDIO_HEADER):
+                raise UnknownValueError()
+            return audio_data[len(FAKE_AUDIO_HEADER):].decode("utf-8").split("\n")[0]
+
+        recognize_sphinx = recognize_google
+
+    def module(name, **attrs):
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+
+    module(
+        "langchain_openai",
+        ChatOpenAI=lambda **kwargs: FakeChatModel(latency=Latency.llm),
+        OpenAIEmbeddings=FakeEmbeddings
+    )
+    module("langchain_pinecone", PineconeVectorStore=FakeVectorStore)
+    module("pinecone", Pinecone=FakePinecone)
+    module(
+        "speech_recognition",
+        Recognizer=Recognizer,
+        AudioFile=AudioFile,
+        RequestError=RequestError,
+        UnknownValueError=UnknownValueError
+    )
+
+# ------------------ SERVER ------------------
+def serve(args):
+    """
+    Run app.py exactly as `streamlit run` would, with the backend fakes installed first
+    """
+    Latency.pinecone = args.pinecone_latency
+    Latency.retrieval = args.retrieval_latency
+    Latency.llm = args.llm_latency
+    Latency.speech = args.speech_latency
+    install_fakes()
+
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", APP_PATH,
+        "--server.port", str(args.port),
+        "--server.address", "127.0.0.1",
+        "--server.headless", "true",
+        "--server.fileWatcherType", "none",
+        # The load generator uploads clips without a browser cookie
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+    sys.exit(cli.main())
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def faq_answers_path(workdir):
+    return os.path.join(workdir, "faq_answers.json")
+
+def start_server(args, workdir):
+    port = free_port()
+    env = dict(os.environ)
+    # Keep the FAQ warmer away from the real answer cache
+    env["USTAX_FAQ_ANSWERS_PATH"] = faq_answers_path(workdir)
+    log_path = os.path.join(workdir, "server.log")
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+        "--pinecone-latency", str(args.pinecone_latency),
+        "--retrieval-latency", str(args.retrieval_latency),
+        "--llm-latency", str(args.llm_latency),
+        "--speech-latency", str(args.speech_latency),
+    ]
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process, port, log_path
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Streamlit server did not start; see {log_path}")
+
+def server_rss_kib(pid):
+    """
+    Resident memory of the server process, or None where /proc is unavailable
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+# ------------------ SESSION CLIENT ------------------
+class SessionClient:
+    """
+    One simulated browser tab speaking Streamlit's websocket protocol
+    """
+
+    def __init__(self, port, timeout):
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+        self.session_id = None
+        self.widgets = {}
+        self.errors = []
+        self.answers = 0
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        self.connection = await websocket_connect(
+            f"ws://127.0.0.1:{self.port}/_stcore/stream",
+            subprotocols=["streamlit"]
+        )
+        await self.rerun([])
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def send(self, back_msg):
+        await self.connection.write_message(back_msg.SerializeToString(), binary=True)
+
+    async def receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        payload = await asyncio.wait_for(self.connection.read_message(), self.timeout)
+        if payload is None:
+            raise ConnectionError("Server closed the session")
+        msg = ForwardMsg()
+        msg.ParseFromString(payload)
+        return msg
+
+    async def rerun(self, widget_states):
+        """
+        Trigger a script run with the given widget values and wait until it (and any st.rerun) finishes
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back_msg = BackMsg()
+        back_msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.send(back_msg)
+
+        while True:
+            msg = await self.receive()
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # A new script run starts; only the final run's page counts
+                self.session_id = msg.new_session.initialize.session_id or self.session_id
+                self.errors = []
+                self.answers = 0
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                self.record_element(msg.delta.new_element)
+            elif kind == "script_finished" and msg.script_finished in (
+                ForwardMsg.FINISHED_SUCCESSFULLY,
+                ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+            ):
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append("script failed to compile")
+                return
+
+    def record_element(self, element):
+        from streamlit.proto.Alert_pb2 import Alert
+
+        kind = element.WhichOneof("type")
+        if kind in ("text_area", "button", "audio_input", "checkbox"):
+            self.widgets[kind] = getattr(element, kind).id
+        elif kind == "exception":
+            self.errors.append(element.exception.message)
+        elif kind == "alert" and element.alert.format == Alert.ERROR:
+            self.errors.append(element.alert.body)
+        elif kind == "markdown" and 'class="assistant-message"' in element.markdown.body:
+            self.answers += 1
+
+    async def ask_text(self, question):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        await self.rerun([
+            WidgetState(id=self.widgets["text_area"], string_value=question),
+            WidgetState(id=self.widgets["button"], trigger_value=True),
+        ])
+
+    async def ask_voice(self, clip):
+        """
+        Upload a clip the way the audio widget does, then rerun with it as the widget value
+        """
+        from tornado.httpclient import AsyncHTTPClient
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import FileUploaderState, UploadedFileInfo
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        request_id = str(uuid.uuid4())
+        back_msg = BackMsg()
+        back_msg.file_urls_request.request_id = request_id
+        back_msg.file_urls_request.session_id = self.session_id
+        back_msg.file_urls_request.file_names.append("clip.wav")
+        await self.send(back_msg)
+
+        while True:
+            msg = await self.receive()
+            if msg.WhichOneof("type") == "file_urls_response" and msg.file_urls_response.response_id == request_id:
+                file_urls = msg.file_urls_response.file_urls[0]
+                break
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="clip.wav"\r\n'
+            "Content-Type: audio/wav\r\n\r\n"
+        ).encode("utf-8") + clip + f"\r\n--{boundary}--\r\n".encode("utf-8")
+        await AsyncHTTPClient().fetch(
+            f"http://127.0.0.1:{self.port}{file_urls.upload_url}",
+            method="PUT",
+            body=body,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            request_timeout=self.timeout
+        )
+
+        state = FileUploaderState(max_file_id=0, uploaded_file_info=[
+            UploadedFileInfo(id=0, name="clip.wav", size=len(clip), file_id=file_urls.file_id, file_urls=file_urls)
+        ])
+        await self.rerun([WidgetState(id=self.widgets["audio_input"], file_uploader_state_value=state)])
+
+# ------------------ SESSION DRIVER ------------------
+def plan_turns(session_id, args):
+    """
+    Pick each turn's question and input mode. Pipeline questions get a unique suffix so
+    no stored or cached result can answer them; FAQ questions are asked verbatim.
+    """
+    rng = random.Random(args.seed + session_id)
+    turns = []
+    for turn in range(1, args.turns + 1):
+        is_faq = rng.random() < args.faq_share
+        if is_faq:
+            question = rng.choice(args.faq_questions)
+        else:
+            question = f"{rng.choice(PIPELINE_QUESTIONS)} (session {session_id}, question {turn})"
+        turns.append((question, is_faq, rng.random() < args.voice_ratio))
+    return turns
+
+async def run_session(session_id, port, args, results, keep_open=None):
+    turns = plan_turns(session_id, args)
+    client = SessionClient(port, args.timeout)
+
+    try:
+        await client.connect()
+    except Exception:
+        # A session that cannot even load counts every planned turn as failed
+        results.extend(
+            {"latency": 0.0, "faq": is_faq, "voice": is_voice, "failed": True}
+            for _, is_faq, is_voice in turns
+        )
+        client.close()
+        return
+
+    for turn, (question, is_faq, is_voice) in enumerate(turns, start=1):
+        started = time.perf_counter()
+        try:
+            if is_voice:
+                # The trailing marker makes each clip unique so the app does not skip it as a repeat
+                await client.ask_voice(FAKE_AUDIO_HEADER + f"{question}\n{session_id}:{turn}".encode("utf-8"))
+            else:
+                await client.ask_text(question)
+            failed = bool(client.errors) or client.answers < turn
+        except Exception:
+            failed = True
+        results.append({
+            "latency": time.perf_counter() - started,
+            "faq": is_faq,
+            "voice": is_voice,
+            "failed": failed,
+        })
+
+    if keep_open is None:
+        client.close()
+    else:
+        keep_open.append(client)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def run_level(concurrency, port, args):
+    results = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(i, port, args, results) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Latency and throughput describe full-pipeline turns only; FAQ hits are reported on their own
+    pipeline = [r["latency"] for r in results if not r["failed"] and not r["faq"]]
+    faq = [r["latency"] for r in results if not r["failed"] and r["faq"]]
+    return {
+        "concurrency": concurrency,
+        "turns": len(results),
+        "pipeline_turns": sum(1 for r in results if not r["faq"]),
+        "faq_turns": sum(1 for r in results if r["faq"]),
+        "voice_turns": sum(1 for r in results if r["voice"]),
+        "errors": sum(1 for r in results if r["failed"]),
+        "throughput": len(pipeline) / elapsed if elapsed else 0.0,
+        "p50": percentile(pipeline, 50),
+        "p95": percentile(pipeline, 95),
+        "p99": percentile(pipeline, 99),
+        "faq_p50": percentile(faq, 50),
+        "faq_p95": percentile(faq, 95),
+    }
+
+async def wait_for_faq_answers(answers_path, questions, timeout):
+    """
+    Block until the background warmer has stored an answer for every FAQ, so all levels
+    run with the same FAQ state instead of answers appearing mid-measurement
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(answers_path, encoding="utf-8") as f:
+                answers = json.load(f).get("answers", {})
+        except (OSError, ValueError):
+            answers = {}
+        if all(answers.get(question, {}).get("answer") for question in questions):
+            return
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"FAQ answers were not generated within {timeout:.0f}s")
+
+async def measure_session_memory(sessions, pid, port, args):
+    """
+    Untimed pass: hold `sessions` sessions open after a conversation each and compare server memory
+    """
+    before = server_rss_kib(pid)
+    if before is None:
+        return None
+
+    results, open_clients = [], []
+    await asyncio.gather(*(run_session(10_000 + i, port, args, results, open_clients) for i in range(sessions)))
+    after = server_rss_kib(pid)
+    for client in open_clients:
+        client.close()
+    return max(0, after - before) / sessions
+
+def find_saturation(levels, latency_factor, min_gain):
+    """
+    First concurrency where p95 latency degrades past the factor or throughput stops growing
+    """
+    if not levels:
+        return None
+    base_p95 = levels[0]["p95"]
+    for previous, level in zip(levels, levels[1:]):
+        # Repeating a concurrency level is a consistency check, not a step up in load
+        if level["concurrency"] <= previous["concurrency"]:
+            continue
+        if base_p95 and level["p95"] > base_p95 * latency_factor:
+            return level["concurrency"]
+        if previous["throughput"] and level["throughput"] < previous["throughput"] * (1 + min_gain):
+            return level["concurrency"]
+    return None
+
+# ------------------ CLI ------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulate concurrent USTax sessions against local backend fakes.")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=5, help="questions asked per session")
+    parser.add_argument("--voice-ratio", type=float, default=0.3, help="share of turns sent as voice input")
+    parser.add_argument("--faq-share", type=float, default=0.2, help="share of turns asking a precomputed FAQ")
+    parser.add_argument("--pinecone-latency", type=float, default=Latency.pinecone, help="seconds per Pinecone admin call")
+    parser.add_argument("--retrieval-latency", type=float, default=Latency.retrieval, help="seconds per retrieval")
+    parser.add_argument("--llm-latency", type=float, default=Latency.llm, help="seconds per GPT-4 call")
+    parser.add_argument("--speech-latency", type=float, default=Latency.speech, help="seconds per transcription")
+    parser.add_argument("--latency-factor", type=float, default=2.0, help="p95 growth over one session that counts as saturated")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="minimum throughput gain expected from more concurrency")
+    parser.add_argument("--memory-sessions", type=int, default=8, help="sessions held open while measuring memory")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per script run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+async def run(args, process, port, answers_path):
+    # Untimed warm-up so imports, caches and the first model build do not land in level 1;
+    # the first page load also starts the FAQ warmer
+    await run_session(-1, port, args, [])
+    await wait_for_faq_answers(answers_path, args.faq_questions, args.timeout)
+
+    levels = []
+    print("Latency and throughput are for full-pipeline turns; FAQ turns are answered from precomputed results.")
+    print(
+        f"{'sessions':>8} {'turns':>6} {'faq':>5} {'errors':>6} {'turns/s':>8} "
+        f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'faq p50':>8} {'faq p95':>8}"
+    )
+    for concurrency in [int(level) for level in args.levels.split(",") if level.strip()]:
+        level = await run_level(concurrency, port, args)
+        levels.append(level)
+        print(
+            f"{level['concurrency']:>8} {level['turns']:>6} {level['faq_turns']:>5} {level['errors']:>6} "
+            f"{level['throughput']:>8.2f} {level['p50']:>7.2f} {level['p95']:>7.2f} {level['p99']:>7.2f} "
+            f"{level['faq_p50']:>8.3f} {level['faq_p95']:>8.3f}"
+        )
+
+    memory = await measure_session_memory(args.memory_sessions, process.pid, port, args)
+    if memory is None:
+        print("Per-session memory: unavailable (needs /proc).")
+    else:
+        print(f"Per-session memory: {memory:.1f} KiB (server RSS with {args.memory_sessions} sessions open).")
+
+    failing = [level["concurrency"] for level in levels if level["errors"]]
+    saturation = None
+    if failing:
+        # Failed turns distort latency and throughput, so a saturation point would be meaningless
+        print(f"Errors at {', '.join(map(str, failing))} concurrent sessions; saturation not reported.")
+    else:
+        saturation = find_saturation(levels, args.latency_factor, args.min_gain)
+        if saturation is None:
+            print("No saturation observed at the tested concurrency levels.")
+        else:
+            print(f"Saturation point: {saturation} concurrent sessions.")
+
+    return {"levels": levels, "memory_per_session_kib": memory, "saturation": saturation}
+
+def main():
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        return
+    args.faq_questions = load_faq_questions()
+
+    workdir = tempfile.mkdtemp(prefix="ustax-load-test-")
+    process, port, log_path = start_server(args, workdir)
+    try:
+        report = asyncio.run(run(args, process, port, faq_answers_path(workdir)))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    print(f"Server log: {log_path}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
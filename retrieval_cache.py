@@ -0,0 +1,138 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from faq_store import normalize_question
+
+logger = logging.getLogger(__name__)
+
+class RetrievalCache:
+    """
+    Retriever results shared by all sessions.
+
+    Each query keeps only document ids and metadata; chunk text is stored once per id
+    in a separate pool bounded by its UTF-8 size, so overlapping results do not duplicate it.
+    Every clear starts a new generation, and results retrieved during an older one are dropped.
+    """
+
+    def __init__(self, max_queries, max_chunk_bytes, index_version_fn, manifest_version_fn, version_ttl_seconds):
+        self.max_queries = max_queries
+        self.max_chunk_bytes = max_chunk_bytes
+        self.index_version_fn = index_version_fn
+        self.manifest_version_fn = manifest_version_fn
+        self.version_ttl_seconds = version_ttl_seconds
+        self.lock = threading.Lock()
+        self.results = OrderedDict()
+        self.chunks = OrderedDict()
+        self.chunk_bytes = 0
+        self.generation = 0
+        self.index_version = None
+        self.manifest_version = None
+        self.checked_at = None
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        self.results.clear()
+        self.chunks.clear()
+        self.chunk_bytes = 0
+        self.generation += 1
+
+    def ensure_current(self):
+        """
+        Drop everything when the ingestion manifest or (at most every TTL) the index version changes.
+        Returns the current generation, to be passed back to put.
+        """
+        manifest_version = self.manifest_version_fn()
+        now = time.monotonic()
+        with self.lock:
+            if (
+                self.checked_at is not None
+                and manifest_version == self.manifest_version
+                and now - self.checked_at < self.version_ttl_seconds
+            ):
+                return self.generation
+
+        index_version = self.index_version_fn()
+        with self.lock:
+            changed = index_version != self.index_version or manifest_version != self.manifest_version
+            self.index_version = index_version
+            self.manifest_version = manifest_version
+            self.checked_at = now
+            if changed:
+                self._clear()
+            return self.generation
+
+    def get(self, key):
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is None:
+                return None
+
+            documents = []
+            for doc_id, metadata in entry:
+                text = self.chunks.get(doc_id)
+                if text is None:
+                    # A chunk was evicted from the pool, so this result can no longer be rebuilt
+                    del self.results[key]
+                    return None
+                self.chunks.move_to_end(doc_id)
+                documents.append(Document(id=doc_id, page_content=text, metadata=dict(metadata)))
+
+            self.results.move_to_end(key)
+            return documents
+
+    def put(self, key, documents, generation=None):
+        entry = []
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                # The cache was invalidated while these were being retrieved, so they may be stale
+                return
+            for doc in documents:
+                doc_id = getattr(doc, "id", None) or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+                # The Pinecone store duplicates chunk text under "text"; keep it only in the chunk pool
+                metadata = {k: v for k, v in (doc.metadata or {}).items() if k != "text"}
+                entry.append((doc_id, metadata))
+                if doc_id not in self.chunks:
+                    self.chunks[doc_id] = doc.page_content
+                    self.chunk_bytes += len(doc.page_content.encode("utf-8"))
+                self.chunks.move_to_end(doc_id)
+
+            self.results[key] = tuple(entry)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_queries:
+                self.results.popitem(last=False)
+            while self.chunk_bytes > self.max_chunk_bytes and self.chunks:
+                _, text = self.chunks.popitem(last=False)
+                self.chunk_bytes -= len(text.encode("utf-8"))
+
+class CachedRetriever(BaseRetriever):
+    """
+    Serve repeated lookups from the shared RetrievalCache before calling the wrapped retriever
+    """
+
+    retriever: BaseRetriever
+    cache: RetrievalCache
+    search_key: str
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        try:
+            generation = self.cache.ensure_current()
+        except Exception as e:
+            logger.warning("Could not check index version, bypassing retrieval cache: %s", e)
+            return self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        key = (normalize_question(query), self.search_key)
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+            self.cache.put(key, documents, generation)
+        return documents
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from conversation import CONVERSATION_PENDING_TURNS, ConversationMemory
+
+
+class StubModel:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=self.reply)
+
+
+def test_summary_line_folds_pending_turns():
+    memory = ConversationMemory()
+    memory.remember("What is the standard deduction?", "It is $14,600 for single filers.")
+    llm = StubModel("SUMMARY: Single filer asking about the standard deduction.\n"
+                    "QUESTION: What is the standard deduction for married filing separately?")
+
+    query = memory.contextualize("What if I file separately?", llm)
+
+    assert query == "What is the standard deduction for married filing separately?"
+    assert memory.summary == "Single filer asking about the standard deduction."
+    assert memory.pending == []
+    assert "It is $14,600 for single filers." in llm.prompts[0]
+
+
+def test_reply_without_summary_keeps_capped_pending_turns():
+    memory = ConversationMemory()
+    llm = StubModel("QUESTION: Rewritten question")
+    for turn in range(CONVERSATION_PENDING_TURNS + 2):
+        memory.remember(f"question {turn}", f"answer {turn}")
+        memory.contextualize("follow-up", llm)
+
+    assert memory.summary == ""
+    assert len(memory.pending) == CONVERSATION_PENDING_TURNS
+    assert memory.pending[-1] == (f"question {CONVERSATION_PENDING_TURNS + 1}", f"answer {CONVERSATION_PENDING_TURNS + 1}")
+
+
+def test_reply_without_question_returns_original_query():
+    memory = ConversationMemory()
+    memory.remember("Can I deduct student loan interest?", "Yes, up to $2,500.")
+    llm = StubModel("SUMMARY: Asked about student loan interest.")
+
+    assert memory.contextualize("What about my spouse?", llm) == "What about my spouse?"
+    assert memory.summary == "Asked about student loan interest."
+
+
+def test_no_history_skips_model():
+    llm = StubModel("QUESTION: unused")
+    assert ConversationMemory().contextualize("What is a W-2?", llm) == "What is a W-2?"
+    assert llm.prompts == []
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from faq_store import FaqStore
+
+FAQ_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faqs.json")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FaqStore(FAQ_PATH, str(tmp_path / "faq_answers.json"))
+    for entry in store.entries:
+        store.update(entry["question"], f"Answer to: {entry['question']}", [{"source": "p17.pdf", "page": 3}], "v1")
+    store.index_version = "v1"
+    return store
+
+
+@pytest.mark.parametrize("query, question", [
+    ("What are the standard deductions for 2024?", "What are the standard deductions for 2024?"),
+    ("what is the standard deduction for 2023", "What are the standard deductions for 2023?"),
+    ("How does the child tax credit work", "How does the child tax credit work?"),
+    ("Do I have to report Venmo transactions to the IRS?", "Do I need to report Venmo transactions to the IRS?"),
+])
+def test_match_serves_same_question(store, query, question):
+    assert store.match(query)["answer"] == f"Answer to: {question}"
+
+
+@pytest.mark.parametrize("query", [
+    "Do I need to report Zelle transactions to the IRS?",
+    "How does the child care tax credit work?",
+    "Can I deduct student loan interest if I don't file jointly?",
+    "What business expenses can't I deduct?",
+    "Do I not need to report Venmo transactions to the IRS?",
+    "What are the standard deductions for 2022?",
+    "Can I deduct my car?",
+])
+def test_match_rejects_different_question(store, query):
+    assert store.match(query) is None
+
+
+def test_match_skips_answers_from_other_index_version(store):
+    store.index_version = "v2"
+    assert store.match("How does the child tax credit work?") is None
+
+
+def test_save_keeps_faq_file_untouched(store, tmp_path):
+    with open(FAQ_PATH, encoding="utf-8") as f:
+        before = f.read()
+    store.save()
+
+    with open(FAQ_PATH, encoding="utf-8") as f:
+        assert f.read() == before
+    reloaded = FaqStore(FAQ_PATH, store.answers_path)
+    reloaded.index_version = "v1"
+    assert reloaded.match("How does the child tax credit work?")["sources"] == [{"source": "p17.pdf", "page": 3}]
+
+
+def test_save_keeps_newer_answers_from_other_processes(store):
+    other = FaqStore(FAQ_PATH, store.answers_path)
+    other.answers = {"How does the child tax credit work?": {"answer": "newer", "index_version": "v1", "updated_at": "9999-01-01T00:00:00"}}
+    other.save()
+
+    store.save()
+    with open(store.answers_path, encoding="utf-8") as f:
+        answers = json.load(f)["answers"]
+    assert answers["How does the child tax credit work?"]["answer"] == "newer"
+    assert len(answers) == len(store.entries)
@@ -0,0 +1,76 @@
+from langchain_core.documents import Document
+
+from retrieval_cache import RetrievalCache
+
+
+class Versions:
+    index = "v1"
+    manifest = None
+
+
+def make_cache(max_queries=10, max_chunk_bytes=10_000):
+    return RetrievalCache(max_queries, max_chunk_bytes, lambda: Versions.index, lambda: Versions.manifest, 300)
+
+
+def documents():
+    return [
+        Document(id="a", page_content="chunk a", metadata={"source": "p17.pdf", "page": 1, "text": "chunk a"}),
+        Document(id="b", page_content="chunk b", metadata={"source": "p17.pdf", "page": 2, "text": "chunk b"}),
+    ]
+
+
+def test_get_rebuilds_documents_without_duplicated_text():
+    cache = make_cache()
+    cache.put("key", documents())
+
+    cached = cache.get("key")
+    assert [doc.page_content for doc in cached] == ["chunk a", "chunk b"]
+    assert cached[0].metadata == {"source": "p17.pdf", "page": 1}
+
+
+def test_evicted_chunk_invalidates_result():
+    cache = make_cache(max_chunk_bytes=len("chunk a"))
+    cache.put("key", documents())
+    assert cache.get("key") is None
+
+
+def test_manifest_change_clears_cache():
+    Versions.manifest = "1"
+    cache = make_cache()
+    cache.ensure_current()
+    cache.put("key", documents())
+
+    Versions.manifest = "2"
+    cache.ensure_current()
+    assert cache.get("key") is None
+    Versions.manifest = None
+
+
+def test_chunk_pool_is_sized_in_utf8_bytes():
+    text = "§ 1.1 ü"
+    cache = make_cache(max_chunk_bytes=len(text.encode("utf-8")))
+    cache.put("key", [Document(id="a", page_content=text)])
+    assert cache.chunk_bytes == len(text.encode("utf-8"))
+
+    cache = make_cache(max_chunk_bytes=len(text))
+    cache.put("key", [Document(id="a", page_content=text)])
+    assert cache.chunk_bytes == 0
+    assert cache.get("key") is None
+
+
+def test_put_from_before_invalidation_is_dropped():
+    Versions.index = "v1"
+    cache = make_cache()
+    generation = cache.ensure_current()
+
+    # Another session sees the new index and clears the cache while this lookup is in flight
+    Versions.index = "v2"
+    cache.checked_at = None
+    cache.ensure_current()
+
+    cache.put("key", documents(), generation)
+    assert cache.get("key") is None
+
+    cache.put("key", documents(), cache.ensure_current())
+    assert cache.get("key") is not None
+    Versions.index = "v1"